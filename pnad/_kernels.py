@@ -0,0 +1,56 @@
+"""
+Low level kernels used by the transformers.
+
+Numba is an optional dependency. If it is installed, kernels are compiled to
+fused loops that do not allocate temporary arrays. Otherwise, equivalent
+NumPy implementations are used.
+"""
+import numpy as np
+
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = prange = None
+
+
+def map_codes(codes, lut, default):
+    """
+    Return an array with lut[code] for each code, or default for codes
+    outside the range of the lookup table.
+
+    Codes may also be floats (e.g., raw columns with missing values). NaN and
+    non-integral values are mapped to default.
+    """
+    codes = np.asarray(codes)
+    if _map_codes is not None and codes.dtype.kind in 'iu':
+        out = np.empty(len(codes), dtype=lut.dtype)
+        _map_codes(codes, lut, out.dtype.type(default), out)
+        return out
+
+    # Invalid codes are redirected to an extra slot holding the default value.
+    lut = np.append(lut, lut.dtype.type(default))
+    size = len(lut) - 1
+    if codes.dtype.kind == 'f':
+        # NaN fails all comparisons, so it is never valid
+        valid = (codes >= 0) & (codes < size) & (np.floor(codes) == codes)
+        return lut[np.where(valid, codes, size).astype(np.intp)]
+
+    # Codes are converted to intp first, since np.where() would otherwise cast
+    # the index of the default slot to the (possibly narrower) dtype of codes.
+    codes = codes.astype(np.intp, copy=False)
+    valid = (codes >= 0) & (codes < size)
+    return lut[np.where(valid, codes, size)]
+
+
+if njit is not None:
+    @njit(cache=True, parallel=True)
+    def _map_codes(codes, lut, default, out):
+        size = len(lut)
+        for i in prange(len(codes)):
+            code = codes[i]
+            if 0 <= code < size:
+                out[i] = lut[code]
+            else:
+                out[i] = default
+else:
+    _map_codes = None
@@ -1,36 +1,67 @@
+import os
+import tempfile
+
 import pandas as pd
-import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
 
 from .utils import cache_path
 
 
 class Cache:
-    def _path(self, year, col):
-        return cache_path(f'cache-{col}-{str(year)}.npy')
+    def _path(self, year):
+        return cache_path(f'cache-{year}.parquet')
+
+    def columns(self, year):
+        """
+        Return the list of columns cached for the given year.
+        """
+        path = self._path(year)
+        if not path.exists():
+            return []
+        return pq.ParquetFile(str(path)).schema.names
 
     def save(self, year, data):
         """
         Save dataframe for given year.
+
+        Columns are merged with the ones already cached for the same year.
+        Categorical columns are stored as dictionary-encoded integer codes
+        and are restored as Categoricals with the same categories on load.
+
+        The file is written to a temporary file and then moved over the cache,
+        so an interrupted save never leaves a corrupt cache behind.
         """
         if isinstance(data, pd.Series):
             data = pd.DataFrame(data)
-        for name, col in data.items():
-            path = str(self._path(year, name))
-            np.save(path, col.values)
+        path = self._path(year)
+        if path.exists():
+            cached = pq.read_table(str(path)).to_pandas()
+            for name, col in data.items():
+                cached[name] = col.values
+            data = cached
+        path.parent.mkdir(parents=True, exist_ok=True)
+        table = pa.Table.from_pandas(data, preserve_index=False)
+        fd, tmp = tempfile.mkstemp(dir=str(path.parent), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                pq.write_table(table, fh, compression='zstd', use_dictionary=True)
+            os.replace(tmp, str(path))
+        except BaseException:
+            os.remove(tmp)
+            raise
 
     def load(self, year, cols):
         """
         Load a data frame data at given years.
         """
-        df = {}
+        cols = list(cols)
+        available = set(self.columns(year))
         for col in cols:
-            try:
-                path = str(self._path(year, col))
-                df[col] = np.load(path, allow_pickle=True)
-            except FileNotFoundError as exc:
-                raise CacheError(col) from exc
-        df = pd.DataFrame(df, columns=cols)
-        return df
+            if col not in available:
+                raise CacheError(col)
+        table = pq.read_table(str(self._path(year)), columns=cols, memory_map=True)
+        return table.to_pandas(zero_copy_only=False, self_destruct=True)
 
 
 class CacheError(Exception):
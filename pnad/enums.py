@@ -7,23 +7,57 @@ def with_category(cls):
     """
     Add methods for conversion to Categorical data.
     """
-    items = [(x.name, x.value) for x in cls if bin(x.value).count('1') <= 1]
+    # Single bit flags and UNKNOWN (zero) are the categories. Iterating over
+    # the class skips zero and composite flags in newer Python versions, so
+    # we use __members__ instead.
+    items = [(x.name, x.value) for x in cls.__members__.values()
+             if (x.value & (x.value - 1)) == 0]
     items.sort(key=lambda x: x[1])
     to_cat = {y: x for x, y in items}
     from_cat = dict(items)
 
+    # Lookup tables from flag values to category codes. Enums whose values
+    # span a wide range (e.g., State) fall back to a binary search over the
+    # sorted values instead of a dense table. Tables have at least 256
+    # entries so uint8 values (e.g., gender_id) can index them directly and
+    # codes use the same int8 dtype pandas uses to store them.
+    values = np.array([y for x, y in items], dtype=np.int64)
+    max_val = int(values[-1])
+    if max_val < 2 ** 16:
+        code_lut = np.full(max(256, max_val + 1), -1, dtype=np.int8)
+        code_lut[values] = np.arange(len(values))
+    else:
+        code_lut = None
+
+    def to_codes(vals):
+        vals = np.asarray(vals)
+        if code_lut is not None and vals.dtype == np.uint8:
+            return code_lut[vals]
+        if vals.dtype.kind == 'f':
+            # NaN, infinite and non-integral values are not valid flags. We
+            # replace them by -1, which is never a valid flag, before casting
+            valid = np.isfinite(vals) & (np.floor(vals) == vals)
+            valid &= np.abs(vals) < 2 ** 62
+            vals = np.where(valid, vals, -1)
+        vals = vals.astype(np.int64, copy=False)
+        if code_lut is not None:
+            invalid = (vals < 0) | (vals >= len(code_lut))
+            codes = code_lut[np.where(invalid, 0, vals)]
+            codes[invalid] = -1
+            return codes
+        idx = np.searchsorted(values, vals).clip(0, len(values) - 1)
+        return np.where(values[idx] == vals, idx, -1)
+
     cls.dtype = pd.CategoricalDtype([x for x, y in items])
     cls.to_category = lambda self: to_cat.get(self.value)
     cls.from_category = staticmethod(lambda cat: cls(from_cat[cat]))
 
     @classmethod
     def categorical(cls, n):
-        if hasattr(n, 'apply'):
-            default = cls.UNKNOWN
-            df = n.apply(lambda x: to_cat.get(x, default))
-            return df.astype(cls.dtype)
-        elif isinstance(n, (np.ndarray, list, tuple)):
-            return cls.categorical(pd.Series(n))
+        if isinstance(n, (pd.Series, np.ndarray, list, tuple)):
+            codes = to_codes(n)
+            cat = pd.Categorical.from_codes(codes, dtype=cls.dtype)
+            return pd.Series(cat, index=n.index if isinstance(n, pd.Series) else None)
         return cls(n).to_category()
 
     cls.categorical = categorical
@@ -113,8 +147,8 @@ class State(enum.IntFlag):
     SUL = 0b1000
     SUDESTE = 0b10000 << 4
     CENTRO_OESTE = 0b10000 << 9
-    NORDESTE = 0b10000 << 14
-    NORTE = 0b10000 << 24
+    NORDESTE = 0b1000000000 << 14
+    NORTE = 0b10000000 << 24
 
     # Masks
     ANY_REGION = SUL | SUDESTE | CENTRO_OESTE | NORTE | NORDESTE
@@ -132,6 +166,35 @@ class State(enum.IntFlag):
             return STATE_NAMES[self]
         return self.name
 
+    @staticmethod
+    def mask(arr, flag):
+        """
+        Return a boolean mask selecting the elements of an array of raw state
+        values (e.g., the "state" column) that belong to the given flag.
+
+        The flag may be any combination of states and regions. A region
+        selects all of its states, unless the flag also includes some state
+        of that region (a state always includes its region bit).
+
+        Example:
+            >>> State.mask([State.BA, State.SP, State.PE], State.NORDESTE)
+            array([ True, False,  True])
+            >>> State.mask([State.BA, State.SP, State.PE], State.BA | State.SP)
+            array([ True,  True, False])
+        """
+        arr = np.asarray(arr, dtype=np.uint32)
+        regions = 0
+        for region, state_bits in REGION_STATE_BITS.items():
+            if flag & region and not flag & state_bits:
+                regions |= region
+
+        # Each state has a single bit besides its region bit, so a state is
+        # selected if all its bits are in the flag
+        flag = np.uint32(flag)
+        selected = ((arr & flag) == arr) | ((arr & np.uint32(regions)) != 0)
+        selected &= arr != 0
+        return selected
+
 
 STATE_NAMES = {
     # Região norte
@@ -155,6 +218,13 @@ STATE_NAMES = {
     State.DF: 'Distrito Federal',
 }
 
+# Bits that identify the states within each region
+REGION_STATE_BITS = {}
+for _state in STATE_NAMES:
+    _region = State(_state & State.ANY_REGION)
+    REGION_STATE_BITS[_region] = REGION_STATE_BITS.get(_region, 0) | (_state & ~_region)
+del _state, _region
+
 # Generic constants
 FIELD_ENUMS = {
     'gender': Gender, 'race': Race, 'state': State,
@@ -1,3 +1,6 @@
+import weakref
+from functools import lru_cache
+
 import pandas as pd
 
 from .transformer import PersonTransformer
@@ -39,7 +42,23 @@ def load_raw(year, which):
     """
     Load raw data frame for given year. `which` must be either 'person' or
     'household'.
+
+    Raw data frames are shared between calls and should not be modified.
     """
+    key = (year, which)
+    df = _RAW_FRAMES.get(key)
+    if df is None:
+        df = _RAW_FRAMES[key] = _read_raw(year, which)
+    return df
+
+
+# The most recent raw frames are kept alive by the LRU cache. Older frames
+# are reused for as long as some other object holds a reference to them.
+_RAW_FRAMES = weakref.WeakValueDictionary()
+
+
+@lru_cache(maxsize=2)
+def _read_raw(year, which):
     name = {'person': 'pes', 'household': 'dom'}
     path = f'{data_path()}/{year}/{name[which]}{year}.pnad'
     return pd.read_pickle(path, 'gzip')
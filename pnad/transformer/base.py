@@ -1,8 +1,12 @@
+import ast
+import inspect
+import textwrap
+from functools import lru_cache
+
 import pandas as pd
 import numpy as np
-from sidekick import Proxy
 
-from ..cache import Cache, CacheError
+from ..cache import Cache
 from ..utils import select_by_year
 
 
@@ -11,6 +15,14 @@ class Transformer:
     Transform a Pandas data frame.
     """
 
+    # Names of all Field attributes, computed when subclasses are created
+    _FIELD_NAMES = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._FIELD_NAMES = tuple(
+            attr for attr in dir(cls) if isinstance(getattr(cls, attr), Field))
+
     def __init__(self, year, fields=None, *, loader):
         self.year = year
         self._cache = Cache()
@@ -22,71 +34,142 @@ class Transformer:
         if len(df.columns) == len(self._fields):
             return df
 
+        missing = [attr for attr in self._fields
+                   if attr != 'year' and attr not in df.columns]
+        columns = Columns(df, self, self._loader)
+        for attr in self._evaluation_order(missing):
+            columns.compute(attr)
+
         extra = {}
-        new = DataFrameProxy(df, self, self._loader)
-        for attr in self._fields:
-            if attr == 'year':
-                pass
-            elif attr not in df.columns:
-                col = getattr(new, attr)
-                if col is not None:
-                    extra[attr] = df[attr] = col
+        for attr in missing:
+            col = columns[attr]
+            if col is None and isinstance(getattr(type(self), attr), (IncomeField, SumField)):
+                # Income fields without a variable in the given year are
+                # presented as missing values
+                col = np.full(len(columns), float('nan'))
+            if col is not None:
+                extra[attr] = df[attr] = col
         if 'year' in self._fields:
-            new['year'] = self.year
+            df['year'] = self.year
         if extra:
             self._cache.save(self.year, pd.DataFrame(extra))
-        new = new[[c for c in self._fields if c in new.columns]]
-        return new
+        return df[[c for c in self._fields if c in df.columns]]
 
     def _all_fields(self):
-        return [attr for attr in dir(self) if not attr.startswith('_')]
+        return (*self._FIELD_NAMES, 'year')
 
     def _load_cached(self):
-        data = pd.DataFrame()
-        for attr in self._fields:
-            if attr == 'year':
-                continue
-            try:
-                data[attr] = self._cache.load(self.year, [attr])[attr]
-            except CacheError as exc:
-                pass
-        return data
-
-
-class DataFrameProxy(Proxy):
+        cached = set(self._cache.columns(self.year))
+        cols = [attr for attr in self._fields if attr != 'year' and attr in cached]
+        if not cols:
+            return pd.DataFrame()
+        return self._cache.load(self.year, cols)
+
+    @classmethod
+    @lru_cache()
+    def _dependencies(cls):
+        """
+        Map each field name to the set of fields it depends on.
+        """
+        fields = set(cls._FIELD_NAMES)
+        return {attr: getattr(cls, attr).dependencies(cls) & fields for attr in fields}
+
+    @classmethod
+    @lru_cache()
+    def _sum_leaves(cls):
+        """
+        Map the name of each SumField to the names of the fields it sums.
+        """
+        return {attr: getattr(cls, attr).leaves(cls) for attr in cls._FIELD_NAMES
+                if isinstance(getattr(cls, attr), SumField)}
+
+    def _evaluation_order(self, fields):
+        """
+        Return the given fields and all their dependencies sorted so that
+        each field comes after the fields it depends on.
+        """
+        deps = self._dependencies()
+        order = []
+        visited = set()
+
+        def visit(attr):
+            if attr in visited:
+                return
+            visited.add(attr)
+            for dep in sorted(deps.get(attr, ())):
+                visit(dep)
+            order.append(attr)
+
+        for attr in fields:
+            visit(attr)
+        return order
+
+
+class Columns:
+    """
+    Dictionary of columns passed to the transformer methods.
+
+    Columns can be accessed either as attributes or as keys. Names that were
+    not computed yet are either evaluated from the transformer fields or
+    fetched from the raw data frame, which is loaded on first use.
+    """
+
     def __init__(self, data, transformer, loader):
-        super().__init__(data)
-        self.__data = data
-        self.__transformer = transformer
-        self.__year = transformer.year
-        self.__loader = loader
-        self.__raw = None
+        self._data = dict(data.items())
+        self._size = len(data) if len(data.columns) else None
+        self._transformer = transformer
+        self._fields = transformer._dependencies()
+        self._loader = loader
+        self._raw = None
 
     def __getattr__(self, item):
+        if item.startswith('_'):
+            raise AttributeError(item)
         try:
-            return getattr(self.__data, item)
-        except AttributeError as exc:
-            return self._fallback(item, exc)
+            return self[item]
+        except KeyError:
+            raise AttributeError(item)
 
     def __getitem__(self, item):
-        try:
-            return self.__data[item]
-        except KeyError as exc:
-            return self._fallback(item, exc)
-
-    def _fallback(self, item, exc):
-        if hasattr(self.__transformer, item):
-            fn = getattr(self.__transformer, item)
-            col = self.__data[item] = fn(self)
-            return col
-        elif self.__raw is None:
-            self.__raw = self.__loader()
-        try:
-            col = self[item] = self.__raw[item]
-        except KeyError:
-            raise exc
+        if item in self._data:
+            return self._data[item]
+        elif item in self._fields:
+            return self.compute(item)
+        raw = self.raw
+        if item not in raw.columns:
+            raise KeyError(item)
+        col = self._data[item] = raw[item]
         return col
 
+    def __contains__(self, item):
+        return item in self._data or item in self._fields or item in self.raw.columns
+
+    def __len__(self):
+        if self._size is None:
+            self._size = len(self.raw)
+        return self._size
+
+    @property
+    def raw(self):
+        """
+        The raw PNAD data frame.
+        """
+        if self._raw is None:
+            self._raw = self._loader()
+        return self._raw
+
+    def compute(self, item):
+        """
+        Return the value of the given transformer field, computing it if
+        necessary. Names that are not fields are looked up in the raw data.
+        """
+        if item not in self._fields:
+            return self[item]
+        if item not in self._data:
+            fn = getattr(self._transformer, item)
+            self._data[item] = fn(self)
+        return self._data[item]
+
 
 class Field:
     """
@@ -104,6 +187,10 @@ class Field:
         self.spec = spec
         self.missing = missing
         self.descr = descr
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.name = name
 
     def __get__(self, instance, cls=None):
         if instance is None:
@@ -114,6 +201,24 @@ class Field:
 
         return field_method
 
+    def dependencies(self, cls):
+        """
+        Return the set of names of other fields of the transformer class cls
+        that are required to compute this field.
+        """
+        return set()
+
+    def resolve(self, year):
+        """
+        Return the raw variable (or constant value) used by the field in the
+        given year.
+
+        Resolution is memoized by select_by_year().
+        """
+        if isinstance(self.spec, (dict, list)):
+            return select_by_year(year, self.spec)
+        return self.spec
+
     def transform(self, loader, df):
         """
         Called with both the raw data frame and the partially
@@ -124,23 +229,33 @@ class Field:
         if isinstance(self.spec, str):
             field = self.spec
         elif isinstance(self.spec, (dict, list)):
-            field = select_by_year(loader.year, self.spec)
+            field = self.resolve(loader.year)
             if field is None:
                 return None
             elif isinstance(field, (int, float)):
-                return np.ones(len(df), dtype=int) * field
+                return np.full(len(df), field)
         else:
             raise ValueError('raise invalid data: %r' % self.spec)
 
         try:
-            col = np.array(df[field])
+            raw = np.asarray(df[field])
         except KeyError:
             return None
-        if self.missing is not None:
-            col = np.where(col == self.missing, float('nan'), col)
+        if self.missing is None:
+            return raw
+
+        # Income codes such as 99999999 are not representable in float32, so
+        # we keep float64 in order to preserve them for IncomeField.
+        col = raw.astype(np.float64)
+        np.putmask(col, raw == self.missing, float('nan'))
         return col
 
 
+# Codes used by PNAD to represent missing/unknown values in income fields
+MISSING_VALS = np.array([-1, 999999, 9999999, 99999999, 999999999, 999999999999],
+                        dtype=np.float64)
+
+
 class IncomeField(Field):
     """
     The income field from PNAD survey.
@@ -153,15 +268,24 @@ class IncomeField(Field):
     def transform(self, loader, df):
         lst = super().transform(loader, df)
         if lst is None:
-            return np.zeros(len(df), dtype=float) * float('nan')
-        return self.remove_missing(lst)
+            return None
+
+        # Field.transform() only copies the raw data when it replaces missing
+        # values. Otherwise we must not modify the raw frame, which is shared.
+        return self.remove_missing(lst, copy=self.missing is None)
 
     @staticmethod
-    def remove_missing(lst):
-        missing = [-1, 999999, 9999999, 99999999, 999999999, 999999999999]
-        lst = np.asfarray(lst)
-        for value in missing:
-            lst[lst == value] = float('nan')
+    def remove_missing(lst, copy=True):
+        """
+        Replace the missing value codes by NaN.
+
+        If copy=False, the input array may be modified in place.
+        """
+        if copy:
+            lst = np.array(lst, dtype=np.float64)
+        else:
+            lst = np.asarray(lst, dtype=np.float64)
+        np.copyto(lst, float('nan'), where=np.isin(lst, MISSING_VALS))
         return lst
 
 
@@ -178,6 +302,66 @@ class FunctionField(Field):
     def transform(self, loader, df):
         return self.func(loader, df)
 
+    def dependencies(self, cls):
+        """
+        Return the set of names accessed as attributes of the data frame
+        argument in the function body.
+
+        Functions whose source cannot be analyzed (e.g., lambdas inside other
+        expressions) return an empty set. Their dependencies are still
+        computed when accessed, since Columns evaluates fields on demand.
+        """
+        try:
+            source = textwrap.dedent(inspect.getsource(self.func))
+            func = ast.parse(source).body[0]
+        except (OSError, TypeError, SyntaxError):
+            return set()
+        if isinstance(func, ast.Expr):
+            func = func.value
+        if not isinstance(func, (ast.FunctionDef, ast.Lambda)):
+            return set()
+        if len(func.args.args) < 2:
+            return set()
+        df = func.args.args[1].arg
+        return {node.attr for node in ast.walk(func)
+                if isinstance(node, ast.Attribute)
+                and isinstance(node.value, ast.Name) and node.value.id == df}
+
+
+class SumField(Field):
+    """
+    Field computed as the sum of other fields using sum_na().
+
+    Terms that are also SumFields are expanded into their own terms, so a
+    whole tree of sums is computed in a single pass over its leaves without
+    allocating the partial sums.
+    """
+
+    def __init__(self, *terms, descr=''):
+        self.terms = terms
+        super().__init__('<processed>', descr=descr)
+
+    def leaves(self, cls):
+        """
+        Return the names of the fields summed by this field, after expanding
+        the terms that are SumFields of the transformer class cls.
+        """
+        leaves = []
+        for term in self.terms:
+            field = getattr(cls, term)
+            if isinstance(field, SumField):
+                leaves.extend(field.leaves(cls))
+            else:
+                leaves.append(term)
+        return leaves
+
+    def dependencies(self, cls):
+        return set(self.leaves(cls))
+
+    def transform(self, loader, df):
+        leaves = type(loader)._sum_leaves()[self.name]
+        return sum_na(*(df[term] for term in leaves))
+
 
 #
 # Decorators and utilities
@@ -195,19 +379,25 @@ def function(*args, **kwargs):
 def sum_na(*args):
     """
     Sum all arguments by replacing nan by zero when necessary
+
+    None arguments (i.e., fields not available in the given year) are
+    ignored. Return None if all arguments are None.
     """
 
-    x0, *others = map(np.asarray, args)
+    args = [x for x in args if x is not None]
+    if not args:
+        return None
+    elif len(args) == 1:
+        return np.asarray(args[0], dtype=np.float64)
 
-    # Create mask of null values
-    isnull = np.isnan(x0)
-    for x in others:
-        isnull &= np.isnan(x)
+    # Stacking copies the inputs, so the stack can be modified in place
+    stack = np.stack([np.asarray(x, dtype=np.float64) for x in args])
+    isnan = np.isnan(stack)
+    isnull = isnan.all(axis=0)
 
     # Sum all inputs assuming nan == 0
-    res = np.where(np.isnan(x0), 0.0, x0)
-    for x in others:
-        res += np.where(np.isnan(x), 0.0, x)
+    stack[isnan] = 0.0
+    res = stack.sum(axis=0)
 
     # Make the entries in which all values are null, null again
     res[isnull] = float('nan')
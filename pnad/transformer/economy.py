@@ -1,4 +1,4 @@
-from .base import IncomeField, FunctionField, sum_na, Field
+from .base import IncomeField, FunctionField, SumField, sum_na, Field
 
 
 class IncomeDataMixin:
@@ -25,19 +25,14 @@ class IncomeDataMixin:
         1977: 'V77', 1976: 'V2359',
     }, descr='Salary received in products')
 
-    @FunctionField
-    def income_work_main_money(self, df):
-        """Sum of fixed + variable money income from main job"""
-
-        return sum_na(df.income_work_main_money_variable,
-                      df.income_work_main_money_fixed)
+    income_work_main_money = SumField(
+        'income_work_main_money_variable', 'income_work_main_money_fixed',
+        descr='Sum of fixed + variable money income from main job')
 
-    @FunctionField
-    def income_work_main(self, df):
-        """Total income from main work"""
-
-        # Also computed in PNAD as V4718 (yr > 1992)
-        return sum_na(df.income_work_main_money, df.income_work_main_products)
+    # Also computed in PNAD as V4718 (yr > 1992)
+    income_work_main = SumField(
+        'income_work_main_money', 'income_work_main_products',
+        descr='Total income from main work')
 
     #
     # Secondary job
@@ -54,18 +49,13 @@ class IncomeDataMixin:
         {(1992, ...): 'V9985', (1980, 1990): None, 1979: 'V2458', (..., 1978): None, },
         descr='Salary of secondary job (products)')
 
-    @FunctionField
-    def income_work_secondary_money(self, df):
-        """Total income from secondary job"""
+    income_work_secondary_money = SumField(
+        'income_work_secondary_money_fixed', 'income_work_secondary_money_variable',
+        descr='Total money income from secondary job')
 
-        return sum_na(df.income_work_secondary_money_fixed,
-                      df.income_work_secondary_money_variable)
-
-    @FunctionField
-    def income_work_secondary(self, df):
-        """Total income from secondary job"""
-
-        return sum_na(df.income_work_secondary_money, df.income_work_secondary_products)
+    income_work_secondary = SumField(
+        'income_work_secondary_money', 'income_work_secondary_products',
+        descr='Total income from secondary job')
 
     #
     # Other jobs
@@ -85,48 +75,34 @@ class IncomeDataMixin:
         1977: 'V87', 1976: None,
     }, descr='')
 
-    @FunctionField
-    def income_work_extra_money(self, df):
-        """Total income from jobs other than primary and secondary"""
-
-        return sum_na(df.income_work_extra_money_fixed,
-                      df.income_work_extra_money_variable)
-
-    @FunctionField
-    def income_work_extra(self, df):
-        """Total income from jobs other than primary and secondary"""
-
-        return sum_na(df.income_work_extra_money, df.income_work_extra_products)
-
-    @FunctionField
-    def income_work_other_money(self, df):
-        """Total income from jobs other than primary and secondary"""
-
-        return sum_na(df.income_work_extra_money, df.income_work_secondary_money)
-
-    @FunctionField
-    def income_work_other_products(self, df):
-        """Total income from jobs other than primary and secondary"""
-
-        return sum_na(df.income_work_extra_products, df.income_work_secondary_products)
+    income_work_extra_money = SumField(
+        'income_work_extra_money_fixed', 'income_work_extra_money_variable',
+        descr='Total money income from jobs other than primary and secondary')
 
-    @FunctionField
-    def income_work_other(self, df):
-        """Total income from jobs other than primary and secondary"""
+    income_work_extra = SumField(
+        'income_work_extra_money', 'income_work_extra_products',
+        descr='Total income from jobs other than primary and secondary')
 
-        return sum_na(df.income_work_other_money, df.income_work_other_products)
+    income_work_other_money = SumField(
+        'income_work_extra_money', 'income_work_secondary_money',
+        descr='Total money income from jobs other than primary')
 
-    @FunctionField
-    def income_work_money(self, df):
-        """Total income from jobs other than primary and secondary"""
+    income_work_other_products = SumField(
+        'income_work_extra_products', 'income_work_secondary_products',
+        descr='Total income in products from jobs other than primary')
 
-        return sum_na(df.income_work_extra_money, df.income_work_main_money)
+    income_work_other = SumField(
+        'income_work_other_money', 'income_work_other_products',
+        descr='Total income from jobs other than primary')
 
-    @FunctionField
-    def income_work_products(self, df):
-        """Total income from jobs other than primary and secondary"""
+    income_work_money = SumField(
+        'income_work_extra_money', 'income_work_main_money',
+        descr='Total money income from main and extra jobs (excludes secondary job)')
 
-        return sum_na(df.income_work_extra_products, df.income_work_main_products)
+    income_work_products = SumField(
+        'income_work_extra_products', 'income_work_main_products',
+        descr='Total income in products from main and extra jobs (excludes '
+              'secondary job)')
 
     #
     # Social security
@@ -152,18 +128,10 @@ class IncomeDataMixin:
         {(1992, ...): 'V1264', (1981, 1990): 'V580', (..., 1979): None},
         descr='Paid to workers that can retire, but decide to continue working', )
 
-    @FunctionField
-    def income_pension(self, df):
-        return sum_na(df.income_pension_main, df.income_pension_other)
-
-    @FunctionField
-    def income_retirement(self, df):
-        return sum_na(df.income_retirement_main, df.income_retirement_other)
-
-    @FunctionField
-    def income_social(self, df):
-        return sum_na(df.income_pension, df.income_retirement,
-                      df.income_permanence_bonus)
+    income_pension = SumField('income_pension_main', 'income_pension_other')
+    income_retirement = SumField('income_retirement_main', 'income_retirement_other')
+    income_social = SumField(
+        'income_pension', 'income_retirement', 'income_permanence_bonus')
 
     #
     # Capital income
@@ -183,7 +151,7 @@ class IncomeDataMixin:
     def income_capital(self, df):
         """All sources of capital income"""
 
-        total = sum_na(df.income_rent, df.income_investiments)
+        total = sum_na(df.income_rent, df.income_investments)
         if self.year == 1977:
             sum_na(df.V94, df.V97)
         return total
@@ -198,34 +166,22 @@ class IncomeDataMixin:
         1977: 'V92', 1976: 'V2364',
     }, descr='')
 
-    @FunctionField
-    def income_misc(self, df):
-        return sum_na(df.income_donation, df.income_other)
+    income_misc = SumField('income_donation', 'income_other')
 
     #
     # Total incomes
     #
-    @FunctionField
-    def income_work(self, df):  # @NoSelf
-        """Sum of all income sources due to labor"""
-
-        # Also computed in PNAD as V4719 (yr > 1992)
-        total = sum_na(df.income_work_main, df.income_work_other)
-
-        # These are used to quantify total income due to work for people who
-        # do not want to declare each job separately
-        if self.year > 1992 and 'V7122' in df and 'V7125' in df:
-            T = IncomeField.remove_missing
-            total = sum_na(total, T(df.V7122), T(df.V7125))
-
-        return total
-
-    @FunctionField
-    def income(self, df):
-        """Total income of an individual"""
-
-        return sum_na(df.income_work, df.income_social, df.income_capital,
-                      df.income_misc)
+    # Also computed in PNAD as V4719 (yr > 1992). V7122 and V7125 quantify
+    # income due to work for people who do not want to declare each job
+    # separately. They are not included here, since the totals have never
+    # been checked against V4719.
+    income_work = SumField(
+        'income_work_main', 'income_work_other',
+        descr='Sum of all income sources due to labor')
+
+    income = SumField(
+        'income_work', 'income_social', 'income_capital', 'income_misc',
+        descr='Total income of an individual')
 
     #
     # Family and household
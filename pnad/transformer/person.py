@@ -1,54 +1,186 @@
+from functools import lru_cache
+
 import numpy as np
 
+from .._kernels import map_codes
 from ..utils import select_by_year
 from .base import Transformer, Field, function
 from .economy import OccupationDataMixin, IncomeDataMixin
 from ..enums import State, Race, Gender
 
 
-class SocialDataMixin:
+#
+# Lookup tables
+#
+def code_table(mapping, default=0, dtype=np.uint8):
     """
-    Basic social variables.
+    Create a lookup table that maps raw PNAD codes to the values in the given
+    {code: value} mapping. Other codes are mapped to default.
+
+    Tables have at least 256 entries, so raw codes stored in a single byte can
+    index them directly (see lookup()). All mapped codes must be below 128,
+    since negative int8 codes fall in the upper half of the table.
     """
-    year: int
+    lut = np.full(max(256, max(mapping) + 1), default, dtype=dtype)
+    for code, value in mapping.items():
+        lut[code] = value
+    return lut
 
-    @function()
-    def gender_id(self, df):
-        """Gender id. Uses the same values adopted in the Gender enum."""
 
-        year = self.year
-        gender = np.ones(len(df), dtype=np.uint8)
-        has_undefined = False
+def lookup(lut, data, default=0):
+    """
+    Map an array of raw codes through a lookup table created by code_table().
 
-        if year == 1976:
-            males = df.V2103 == 1
-            females = df.V2103 == 2
+    Codes outside the range of the table are mapped to default. This includes
+    NaN and non-integral codes found in raw columns stored as floats.
+    """
+    data = np.asarray(data)
+    if data.dtype.kind in 'iu' and data.dtype.itemsize == 1 and len(lut) == 256:
+        return lut[data.view(np.uint8)]
+    return map_codes(data, lut, default)
 
-        elif year == 1977:
-            males = df.V16 == 1
-            females = df.V16 == 2
 
-        elif 1978 <= year <= 1979:
-            males = df.V2203 == 1
-            females = df.V2203 == 2
+@lru_cache()
+def gender_table(male, female):
+    """
+    Lookup table for the given raw codes of male and female respondents.
+    """
+    return code_table({male: Gender.MALE, female: Gender.FEMALE}, Gender.UNKNOWN)
+
+
+# Raw variable and the codes for male and female respondents in each year
+GENDER_SPEC = {
+    1976: ('V2103', 1, 2),
+    1977: ('V16', 1, 2),
+    (1978, 1979): ('V2203', 1, 2),
+    (1981, 1990): ('V303', 1, 3),
+    (1992, ...): ('V0302', 2, 4),
+}
+
+
+# Raw race codes adopted in different periods of the survey
+RACE_TABLE_1976 = code_table(
+    {1: Race.WHITE, 2: Race.BLACK, 3: Race.ASIAN, 4: Race.BROWN})
+RACE_TABLE_1982 = code_table(
+    {1: Race.WHITE, 3: Race.BLACK, 5: Race.BROWN, 7: Race.ASIAN})
+RACE_TABLE_1987 = code_table(
+    {2: Race.WHITE, 4: Race.BLACK, 6: Race.BROWN, 8: Race.ASIAN})
+RACE_TABLE_1992 = code_table(
+    {0: Race.INDIGENOUS, 2: Race.WHITE, 4: Race.BLACK, 6: Race.ASIAN, 8: Race.BROWN})
+RACE_TABLES = {1976: RACE_TABLE_1976, 1982: RACE_TABLE_1982, 1987: RACE_TABLE_1987,
+               1992: RACE_TABLE_1992}
+
+# Raw variable with the race code and the coding period adopted in each year.
+# Race is not available in the years mapped to None.
+RACE_SPEC = {
+    1976: ('V303', 1976),  # empty = 5, but there are some outliers: 6, 8
+    (1977, 1981): None,
+    # empty = 9, 0 or -2
+    1982: ('V6302', 1982),  # complete
+    1983: None,
+    1984: ('V2301', 1982),  # fertility survey, only women
+    1985: ('V2301', 1982),  # minors supplement, only ages in [0, 17]
+    1986: ('V2201', 1982),  # health care supplement - random respondents
+    (1987, 1990): ('V304', 1987),  # empty = 9 or 7
+    1991: None,
+    (1992, ...): ('V0404', 1992),  # empty = 9
+}
+
+# Age for each raw code from 0 to 999, where 999 means unknown. We use float32
+# since most CPUs have no native support for float16 arithmetic.
+AGE_TABLE = np.arange(1000, dtype=np.float32)
+AGE_TABLE[999] = np.nan
+
+# It seems that in 1977 small values (<100) are estimated age, while large
+# values >800 are the last tree digits of the year the person was born
+AGE_TABLE_1977 = np.arange(1000, dtype=np.float32)
+AGE_TABLE_1977[801:] = 1977 - (AGE_TABLE_1977[801:] + 1000)
+
+# Raw variable with the age in each year
+AGE_SPEC = {
+    1976: 'V2105',
+    1977: 'V22',
+    (1978, 1980): 'V2805',
+    (1981, 1991): 'V805',
+    (1992, ...): 'V8005',
+}
+
+# Years of education for the raw codes used from 1976 to 1990. Code 10 means
+# 9 to 11 years and code 11 means 12 or more years. Larger codes are missing.
+EDUCATION_TABLE_1976 = code_table(
+    {**{code: code - 1 for code in range(1, 10)}, 10: 10, 11: 12},
+    np.nan, np.float32)
+
+# Raw state codes adopted in different periods of the survey. Unknown codes
+# are mapped to State.UNKNOWN, which is not a valid state.
+s = State
+STATE_TABLE_1992 = code_table({
+    11: s.RO, 12: s.AC, 13: s.AM, 14: s.RR, 15: s.PA, 16: s.AP, 17: s.TO,
+    21: s.MA, 22: s.PI, 23: s.CE, 24: s.RN, 25: s.PB, 26: s.PE, 27: s.AL,
+    28: s.SE, 29: s.BA, 31: s.MG, 32: s.ES, 33: s.RJ, 35: s.SP, 41: s.PR,
+    42: s.SC, 43: s.RS, 50: s.MS, 51: s.MT, 52: s.GO, 53: s.DF
+}, s.UNKNOWN, np.uint32)
+STATE_TABLE_1980 = code_table({
+    11: s.RJ, 12: s.RJ, 13: s.RJ, 14: s.RJ, 20: s.SP, 21: s.SP, 22: s.SP,
+    23: s.SP, 24: s.SP, 25: s.SP, 26: s.SP, 27: s.SP, 28: s.SP, 29: s.SP,
+    30: s.PR, 31: s.PR, 32: s.SC, 33: s.RS, 34: s.RS, 35: s.RS, 37: s.PR,
+    41: s.MG, 42: s.MG, 43: s.ES, 51: s.MA, 52: s.PI, 53: s.CE, 54: s.RN,
+    55: s.PB, 56: s.PE, 57: s.AL, 58: s.SE, 59: s.BA, 60: s.BA, 61: s.DF,
+    71: s.RO, 72: s.AC, 73: s.AM, 74: s.RR, 75: s.PA, 76: s.AP, 81: s.MS,
+    82: s.MT, 83: s.GO
+}, s.UNKNOWN, np.uint32)
+STATE_TABLE_1976 = code_table({
+    11: s.RJ, 21: s.SP, 31: s.PR, 32: s.SC, 33: s.RS, 41: s.MG, 43: s.ES,
+    51: s.MA, 52: s.PI, 53: s.CE, 54: s.RN, 55: s.PB, 56: s.PE, 57: s.AL,
+    58: s.SE, 59: s.BA, 61: s.DF, 71: s.RN, 72: s.AC, 73: s.AM, 74: s.RR,
+    75: s.PA, 76: s.AP, 77: s.MT, 78: s.GO
+}, s.UNKNOWN, np.uint32)
+del s
+STATE_TABLES = {1992: STATE_TABLE_1992, 1980: STATE_TABLE_1980, 1976: STATE_TABLE_1976}
+
+# Raw variable with the state code and the coding period adopted in each year
+STATE_SPEC = {
+    (1992, ...): ('UF', 1992),
+    (1980, 1991): ('V10', 1980),
+    1979: ('V17', 1976),
+    1978: ('V6', 1976),
+    1977: ('V2', 1976),
+    1976: ('V3', 1976),
+}
+
+
+def state_codes(lut, data):
+    """
+    Map raw state codes to State values using one of the STATE_TABLES.
 
-        elif 1981 <= year <= 1990:
-            males = df.V303 == 1
-            females = df.V303 == 3
+    Raise a ValueError if some code does not correspond to a valid state.
+    """
+    data = np.asarray(data)
+    out = lookup(lut, data, State.UNKNOWN)
+    if not out.all():  # State.UNKNOWN is zero
+        raise ValueError('missing states!', np.unique(data[out == State.UNKNOWN]))
+    return out
 
-        elif year >= 1992:
-            males = df.V0302 == 2
-            females = df.V0302 == 4
 
-        else:
-            raise ValueError('cannot compute gender for year %s' % year)
+class SocialDataMixin:
+    """
+    Basic social variables.
+    """
+    year: int
 
-        if not has_undefined:
-            assert (males | females).all()
+    @function()
+    def gender_id(self, df):
+        """Gender id. Uses the same values adopted in the Gender enum."""
 
-        np.putmask(gender, gender, Gender.UNKNOWN)
-        np.putmask(gender, males, Gender.MALE)
-        np.putmask(gender, females, Gender.FEMALE)
+        col, male, female = select_by_year(self.year, GENDER_SPEC)
+        data = np.asarray(df[col])
+        gender = lookup(gender_table(male, female), data, Gender.UNKNOWN)
+
+        # Gender.UNKNOWN is zero, so we can check for invalid codes without
+        # creating a boolean mask
+        if not gender.all():
+            raise ValueError('invalid gender codes',
+                             np.unique(data[gender == Gender.UNKNOWN]))
         return gender
 
     @function()
@@ -61,90 +193,21 @@ class SocialDataMixin:
     def age(self, df):
         """Age of each individual"""
 
-        year = self.year
-        age = np.ones(len(df), dtype=np.int8)
-
-        if year == 1976:
-            age = df.V2105
-        elif year == 1977:
-            # It seems that small values (<100) are estimated age, while
-            # large values >800 are the last tree digits of the year the
-            # person was born
-            age = np.array(df.V22)
-            np.putmask(age, age > 800, 1977 - (age + 1000))
-
-        elif year < 1981:
-            age = df.V2805
-        elif year < 1992:
-            age = df.V805
-        elif year >= 1992:
-            age = df.V8005
-
-        # Prepare to return
-        age = np.array(age, dtype=np.float16)
-        for missing in [999]:
-            np.putmask(age, age == missing, float('nan'))
-        return age
+        field = select_by_year(self.year, AGE_SPEC)
+        lut = AGE_TABLE_1977 if self.year == 1977 else AGE_TABLE
+        return lookup(lut, df[field], np.nan)
 
     @function()
     def race_id(self, df):
         """Race as described in the Race enum."""
 
-        year = self.year
-
-        # Create masks
-        indigenous = np.zeros(len(df), dtype=bool)
-        if year == 1976:
-            race = np.array(df['V303'], dtype=int)
-            white = race == 1
-            black = race == 2
-            asian = race == 3
-            brown = race == 4
-            # empty = race == 5, but there are some outliers: 6, 8
-
-        elif year in [1982, 1984, 1985, 1986]:
-            key = {
-                1982: 'V6302',  # complete
-                1984: 'V2301',  # fertility survey, only women
-                1985: 'V2301',  # minors supplement, only ages in [0, 17]
-                1986: 'V2201',  # health care supplement - random respondents
-            }[year]
-            race = np.array(df[key], dtype=int)
-            white = race == 1
-            black = race == 3
-            brown = race == 5
-            asian = race == 7
-            # empty = (race == 9) | (race == 0) | (race == -2)
-
-        elif 1987 <= year <= 1990:
-            race = np.array(df['V304'], dtype=int)
-            white = race == 2
-            black = race == 4
-            brown = race == 6
-            asian = race == 8
-            # empty = (race == 9) | (race == 7)
-
-        elif year >= 1992:
-            race = np.array(df['V0404'], dtype=int)
-            indigenous = race == 0
-            white = race == 2
-            black = race == 4
-            asian = race == 6
-            brown = race == 8
-            # empty = race == 9
-
-        else:
+        spec = select_by_year(self.year, RACE_SPEC)
+        if spec is None:
             return None
+        key, period = spec
+        return lookup(RACE_TABLES[period], df[key], Race.UNKNOWN)
 
-        # Save correct values
-        race = np.zeros(len(race), dtype=np.uint8)  # Race.unknown
-        np.putmask(race, indigenous, Race.INDIGENOUS)
-        np.putmask(race, white, Race.WHITE)
-        np.putmask(race, black, Race.BLACK)
-        np.putmask(race, asian, Race.ASIAN)
-        np.putmask(race, brown, Race.BROWN)
-        return race
-
+    @function()
     def race(self, df):
         """Race as categorical data."""
         race = df.race_id
@@ -160,9 +223,10 @@ class SocialDataMixin:
         year = self.year
 
         if year == 1977:
-            y_edu = np.array(df.V136, dtype=float)
-            y_edu[y_edu == 9] = 10.0
-            y_edu[y_edu == 10] = 12.0
+            # Code 9 means 9 to 11 yrs and 10 means 12 or more yrs
+            data = np.asarray(df.V136)
+            y_edu = np.select([data < 0, data == 9, data == 10],
+                              [np.nan, 10.0, 12.0], data).astype(np.float32)
 
         elif year < 1992:
             field = select_by_year(year, {
@@ -170,24 +234,16 @@ class SocialDataMixin:
                 1979: 'V2507',
                 (1981, ...): 'V318',
             })
-            data = np.array(df[field])
-            y_edu = np.array(data - 1, dtype=float)
-
-            # Field (10 - 1) => 9 means 9 to 11 yrs
-            # Field (11 - 1) => 10 means 12 or more yrs
-            y_edu[data == 10] = 10.0
-            y_edu[data == 11] = 12.0
-            y_edu[data >= 12] = float('nan')
+            y_edu = lookup(EDUCATION_TABLE_1976, df[field], np.nan)
 
         else:
             field = select_by_year(year, {
                 (..., 2006): 'V4703',
                 (2007, ...): 'V4803',
             })
-            y_edu = np.array(df[field] - 1, dtype=float)
-            y_edu[y_edu >= 16] = float('nan')
+            data = np.asarray(df[field]) - 1
+            y_edu = np.where((data >= 0) & (data < 16), data, np.nan).astype(np.float32)
 
-        y_edu[y_edu < 0] = float('nan')
         return y_edu
 
 
@@ -198,60 +254,8 @@ class GeographicDataMixin:
     def state(self, df):
         """State in which the respondent lives"""
 
-        s = State
-        year = self.year
-        D0 = {
-            11: s.RO, 12: s.AC, 13: s.AM, 14: s.RR, 15: s.PA, 16: s.AP, 17: s.TO,
-            21: s.MA, 22: s.PI, 23: s.CE, 24: s.RN, 25: s.PB, 26: s.PE, 27: s.AL,
-            28: s.SE, 29: s.BA, 31: s.MG, 32: s.ES, 33: s.RJ, 35: s.SP, 41: s.PR,
-            42: s.SC, 43: s.RS, 50: s.MS, 51: s.MT, 52: s.GO, 53: s.DF
-        }
-        D1 = {
-            11: s.RJ, 12: s.RJ, 13: s.RJ, 14: s.RJ, 20: s.SP, 21: s.SP, 22: s.SP,
-            23: s.SP, 24: s.SP, 25: s.SP, 26: s.SP, 27: s.SP, 28: s.SP, 29: s.SP,
-            30: s.PR, 31: s.PR, 32: s.SC, 33: s.RS, 34: s.RS, 35: s.RS, 37: s.PR,
-            41: s.MG, 42: s.MG, 43: s.ES, 51: s.MA, 52: s.PI, 53: s.CE, 54: s.RN,
-            55: s.PB, 56: s.PE, 57: s.AL, 58: s.SE, 59: s.BA, 60: s.BA, 61: s.DF,
-            71: s.RO, 72: s.AC, 73: s.AM, 74: s.RR, 75: s.PA, 76: s.AP, 81: s.MS,
-            82: s.MT, 83: s.GO
-        }
-        D2 = {
-            11: s.RJ, 21: s.SP, 31: s.PR, 32: s.SC, 33: s.RS, 41: s.MG, 43: s.ES,
-            51: s.MA, 52: s.PI, 53: s.CE, 54: s.RN, 55: s.PB, 56: s.PE, 57: s.AL,
-            58: s.SE, 59: s.BA, 61: s.DF, 71: s.RN, 72: s.AC, 73: s.AM, 74: s.RR,
-            75: s.PA, 76: s.AP, 77: s.MT, 78: s.GO
-        }
-
-        # Make conversion
-        def convert(data, map):
-            out = np.zeros(len(data), dtype=np.uint32)
-            mask = np.zeros(len(data), dtype=bool)
-
-            for prev, final in map.items():
-                mask_k = (data == prev)
-                mask |= mask_k
-                out[mask_k] = final
-
-            if not mask.all():
-                count(data[~mask])
-                raise ValueError('missing states!', data[~mask])
-
-            return out
-
-        if year >= 1992:
-            return convert(np.array(df.UF), D0)
-        elif year > 1979:
-            return convert(np.array(df.V10), D1)
-        elif year == 1979:
-            return convert(np.array(df.V17), D2)
-        elif year == 1978:
-            return convert(np.array(df.V6), D2)
-        elif year == 1977:
-            return convert(np.array(df.V2), D2)
-        elif year == 1976:
-            return convert(np.array(df.V3), D2)
-        else:
-            raise ValueError('invalid year', year)
+        col, period = select_by_year(self.year, STATE_SPEC)
+        return state_codes(STATE_TABLES[period], df[col])
 
 
 class SuplementMixin:
@@ -270,7 +274,7 @@ class SuplementMixin:
 
         if self.year == 1984:
             data = np.array(df.V2310, dtype=float)
-            has_data = np.array(df.V2309, dtype=np.int8)
+            has_data = np.asarray(df.V2309)
             data[(has_data == 9) | (has_data == -1)] = float('nan')
             data[(data == 99) | (data == -1)] = float('nan')
             data[has_data == 4] = 0.0
@@ -1,4 +1,5 @@
 import os
+from functools import lru_cache
 from pathlib import Path
 
 import numpy as np
@@ -36,6 +37,7 @@ def _base():
 #
 PNAD_YEARS = deferred(lambda: np.array(
     sorted(int(yy) for yy in os.listdir(str(data_path())) if yy.isdigit())))
+PNAD_YEARS_SET = deferred(lambda: frozenset(int(yy) for yy in PNAD_YEARS))
 HAS_FULL_RACE_INFO_YEARS = deferred(lambda: [1982, *years(1987, ...)])
 
 
@@ -67,14 +69,15 @@ def years(*args):
     a = None if a is Ellipsis else a
     b = None if b is Ellipsis else b
 
-    if a is not None and b is not None:
-        return [y for y in PNAD_YEARS if a <= y <= b]
-    elif b is not None:
-        return [y for y in PNAD_YEARS if y <= b]
-    elif a is not None:
-        return [y for y in PNAD_YEARS if a <= y]
-    else:
-        return list(PNAD_YEARS)
+    return list(_years_range(a, b))
+
+
+@lru_cache(maxsize=128)
+def _years_range(a, b):
+    # PNAD_YEARS is sorted, so we can find both bounds by bisection
+    lo = 0 if a is None else PNAD_YEARS.searchsorted(a, 'left')
+    hi = len(PNAD_YEARS) if b is None else PNAD_YEARS.searchsorted(b, 'right')
+    return tuple(PNAD_YEARS[lo:hi].tolist())
 
 
 def prepare_years(*args):
@@ -95,13 +98,13 @@ def prepare_years(*args):
 
     yrs = args[0]
     if yrs is None or yrs is Ellipsis:
-        return list(PNAD_YEARS)
+        return years()
     elif isinstance(yrs, tuple):
         return years(yrs)
     elif isinstance(yrs, int):
         return [yrs]
     else:
-        return [yy for yy in yrs if yy in PNAD_YEARS]
+        return [yy for yy in yrs if yy in PNAD_YEARS_SET]
 
 
 def select_by_year(year, D):
@@ -122,10 +125,20 @@ def select_by_year(year, D):
         'blah'
     """
 
-    # Must have a list of specifications
+    # Must have a hashable list of specifications
     if hasattr(D, 'items'):
-        D = list(D.items())
-
+        D = D.items()
+    spec = tuple(tuple(item) for item in D)
+    try:
+        return _select_by_year(year, spec)
+    except TypeError:
+        # Unhashable specifications (e.g., using lists as ranges) are not
+        # cached
+        return _select_by_year.__wrapped__(year, spec)
+
+
+@lru_cache(maxsize=None)
+def _select_by_year(year, D):
     # We want a sorted and normalized list
     spec = []
     for item, value in D:
@@ -165,4 +178,5 @@ def filter_years(years, valid=None):
     if valid is None:
         return years
     else:
+        valid = valid if isinstance(valid, (set, frozenset)) else set(valid)
         return [yy for yy in years if yy in valid]